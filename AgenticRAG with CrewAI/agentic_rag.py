@@ -1,20 +1,275 @@
 import streamlit as st
-import re
+import os
+import platform
+import hashlib
+import sqlite3
+import pickle
+import shutil
+import tempfile
+from collections import OrderedDict
+from contextlib import closing
+import faiss
+import litellm
+import numpy as np
 from crewai import Agent, Task, Crew, Process
 from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.vectorstores import FAISS
+from langchain.vectorstores.utils import DistanceStrategy
+from langchain.docstore.in_memory import InMemoryDocstore
 from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.embeddings.base import Embeddings
 from crewai import LLM
 
-def process_pdf(pdf_path):
+# Optional int8 ONNX Runtime backend for the embedder (pip install "optimum[onnxruntime]").
+# Opt-in with AGENTIC_RAG_ONNX_INT8=1: it changes every retrieval embedding.
+try:
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+except ImportError:
+    ort = None
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+# 4-bit FastScan PQ: codes are laid out so SIMD shuffles do the LUT lookups.
+# M=48 gives 8-dim sub-vectors, a supported FastScan kernel shape for d=384.
+IVFPQ_FACTORY = "IVF64,PQ48x4fs"
+IVFPQ_NPROBE = 8
+EMBED_BATCH_SIZE = 64
+# IVF64 needs ~39 training points per centroid (2496). Each 4-bit PQ codebook has 16 centroids
+# and so needs ~39*16 = 624, which that already covers. Below this a flat index is both faster and exact.
+IVFPQ_MIN_TRAIN = 64 * 39
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 220
+CACHE_DIR = "cache"
+VECTORSTORE_CACHE_ENTRIES = 4  # indexes kept in memory; older ones reload from CACHE_DIR
+EMBED_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite")
+COPY_BUFSIZE = 1 << 20
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+PROMPT_CACHE_SIZE = 256
+PROMPT_CACHE_THRESHOLD = 0.92
+USE_ONNX_INT8 = os.environ.get("AGENTIC_RAG_ONNX_INT8") == "1"
+ONNX_MODEL_DIR = os.path.join(CACHE_DIR, "onnx-int8")
+ONNX_FP32_DIR = os.path.join(CACHE_DIR, "onnx-fp32")
+ONNX_MAX_LENGTH = 256  # all-MiniLM-L6-v2 max_seq_length
+
+def build_index(xb):
+    # Vectors are L2-normalised, so inner product is cosine similarity.
+    xb = np.ascontiguousarray(xb, dtype=np.float32)
+    if len(xb) < IVFPQ_MIN_TRAIN:
+        index = faiss.IndexFlatIP(EMBEDDING_DIM)
+        index.add(xb)
+        return index
+    index = faiss.index_factory(EMBEDDING_DIM, IVFPQ_FACTORY, faiss.METRIC_INNER_PRODUCT)
+    index.train(xb)
+    index.add(xb)
+    faiss.extract_index_ivf(index).nprobe = IVFPQ_NPROBE
+    return index
+
+def detect_quantization_target():
+    # u8 activations x s8 weights saturate on x86 without VNNI, so those CPUs get the reduce_range config
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        flags = ""
+    if "avx512_vnni" in flags or "avx_vnni" in flags:
+        return "avx512_vnni"
+    return "avx2"
+
+def quantization_config(target):
+    if target == "arm64":
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    if target == "avx512_vnni":
+        return AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    return AutoQuantizationConfig.avx2(is_static=False, per_channel=False, reduce_range=True)
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """MiniLM sentence embeddings from a dynamically int8-quantized ONNX export (mean pooling + L2 norm)."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, batch_size=EMBED_BATCH_SIZE):
+        target = detect_quantization_target()
+        model_dir = f"{ONNX_MODEL_DIR}-{target}"
+        # Distinct name so int8 vectors never share embedding/index cache entries with fp32 (or other int8) ones
+        self.model_name = f"{model_name}#onnx-int8-{target}"
+        self.batch_size = batch_size
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            self._export(model_name, model_dir, target)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self.session.get_inputs()]
+
+    @staticmethod
+    def _export(model_name, model_dir, target):
+        # One-time fp32 ONNX export, then dynamic int8 quantization of the MatMul weights
+        ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(ONNX_FP32_DIR)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+        quantizer = ORTQuantizer.from_pretrained(ONNX_FP32_DIR)
+        quantizer.quantize(save_dir=model_dir, quantization_config=quantization_config(target))
+
+    def encode(self, texts):
+        out = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            inputs = self.tokenizer(batch, padding=True, truncation=True, max_length=ONNX_MAX_LENGTH, return_tensors="np")
+            feed = {name: inputs[name].astype(np.int64) for name in self._input_names}
+            token_embeddings = self.session.run(None, feed)[0]
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            out[start:start + len(batch)] = pooled / np.linalg.norm(pooled, axis=1, keepdims=True).clip(1e-12)
+        return out
+
+    def embed_documents(self, texts):
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.encode([text])[0].tolist()
+
+def encode_texts(embedding_model, texts):
+    if isinstance(embedding_model, OnnxMiniLMEmbeddings):
+        return embedding_model.encode(texts)
+    # One batched, normalised forward pass over every chunk instead of LangChain's per-call path.
+    vecs = embedding_model.client.encode(
+        texts,
+        batch_size=EMBED_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    return np.asarray(vecs, dtype=np.float32)
+
+def embedding_cache_key(model_name, text):
+    return hashlib.blake2b((model_name + "\0" + text).encode("utf-8"), digest_size=32).digest()
+
+def open_embedding_cache():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(EMBED_CACHE_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+    return conn
+
+def embed_cached(conn, embedding_model, texts):
+    # Content-addressed cache: identical chunk text under the same model is never re-encoded.
+    keys = [embedding_cache_key(embedding_model.model_name, t) for t in texts]
+    xb = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    placeholders = ",".join("?" * len(keys))
+    rows = conn.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders})", keys)
+    found = dict(rows.fetchall())
+    missing = []
+    for i, key in enumerate(keys):
+        if key in found:
+            xb[i] = np.frombuffer(found[key], dtype=np.float32)
+        else:
+            missing.append(i)
+    if missing:
+        vecs = encode_texts(embedding_model, [texts[i] for i in missing])
+        xb[missing] = vecs
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+                [(keys[i], vec.tobytes()) for i, vec in zip(missing, vecs)],
+            )
+    return xb
+
+@st.cache_resource
+def get_embedding_model(model_name=EMBEDDING_MODEL_NAME):
+    if USE_ONNX_INT8 and ort is not None:
+        return OnnxMiniLMEmbeddings(model_name)
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        encode_kwargs={"batch_size": EMBED_BATCH_SIZE, "normalize_embeddings": True},
+    )
+
+@st.cache_resource
+def get_llm():
+    return LLM(model="ollama/deepseek-r1:1.5b", base_url="http://localhost:11434")
+
+def iter_chunk_batches(pdf_path, batch_size=EMBED_BATCH_SIZE):
+    # Parse and split page by page so the full page list is never materialised alongside the chunks.
     loader = PyPDFLoader(pdf_path)
-    docs = loader.load()
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=220)
-    split_docs = text_splitter.split_documents(docs)
-    embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vectorstore = FAISS.from_documents(split_docs, embedding_model)
-    return vectorstore
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    batch = []
+    for page in loader.lazy_load():
+        batch.extend(text_splitter.split_documents([page]))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield batch
+
+def index_pdf(pdf_path, embedding_model):
+    split_docs = []
+    vec_batches = []
+    with closing(open_embedding_cache()) as conn:
+        for batch in iter_chunk_batches(pdf_path):
+            split_docs.extend(batch)
+            vec_batches.append(embed_cached(conn, embedding_model, [d.page_content for d in batch]))
+    xb = np.concatenate(vec_batches) if vec_batches else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    return build_index(xb), split_docs
+
+def make_vectorstore(embedding_model, index, split_docs):
+    ids = np.arange(len(split_docs)).astype("U").tolist()
+    return FAISS(
+        embedding_function=embedding_model.embed_query,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, split_docs))),
+        index_to_docstore_id=dict(enumerate(ids)),
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+    )
+
+def pdf_cache_key(pdf_bytes, model_name):
+    # Everything that changes the persisted chunks or index layout is part of the key
+    h = hashlib.blake2b(digest_size=32)
+    settings = [model_name, IVFPQ_FACTORY, str(IVFPQ_MIN_TRAIN), str(CHUNK_SIZE), str(CHUNK_OVERLAP)]
+    h.update("\0".join(settings).encode("utf-8") + b"\0")
+    h.update(pdf_bytes)
+    return h.hexdigest()
+
+# Write via a temp file in the same directory and rename, so readers never see a partial file
+def write_atomic(path, write_fn):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def dump_pickle(obj, path):
+    with open(path, "wb") as f:
+        pickle.dump(obj, f)
+
+@st.cache_resource(max_entries=VECTORSTORE_CACHE_ENTRIES)
+def load_vectorstore(pdf_key, _uploaded_file):
+    # Indexes are persisted per PDF content hash, so re-opening a known file skips parsing and embedding.
+    embedding_model = get_embedding_model()
+    index_path = os.path.join(CACHE_DIR, f"{pdf_key}.faiss")
+    docs_path = os.path.join(CACHE_DIR, f"{pdf_key}.pkl")
+    if os.path.exists(index_path) and os.path.exists(docs_path):
+        index = faiss.read_index(index_path)
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = IVFPQ_NPROBE
+        with open(docs_path, "rb") as f:
+            split_docs = pickle.load(f)
+    else:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Per-upload file, so concurrent sessions never index each other's PDF under their key.
+        # Stream the upload to disk in 1 MiB blocks rather than materialising another full copy.
+        _uploaded_file.seek(0)
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix=".pdf", delete=False) as f:
+            shutil.copyfileobj(_uploaded_file, f, COPY_BUFSIZE)
+        try:
+            index, split_docs = index_pdf(f.name, embedding_model)
+        finally:
+            os.remove(f.name)
+        write_atomic(docs_path, lambda path: dump_pickle(split_docs, path))
+        write_atomic(index_path, lambda path: faiss.write_index(index, path))
+    return make_vectorstore(embedding_model, index, split_docs)
 
 class PDFRetrievalAgent(Agent):
     def __init__(self, retriever):
@@ -31,35 +286,194 @@ class PDFRetrievalAgent(Agent):
         retrieved_text = "\n".join([doc.page_content for doc in docs])
         return retrieved_text
 
+class SemanticCache:
+    """LRU answer cache keyed by (question, context).
+
+    An exact hash of both is tried first; otherwise a prior answer is reused only if it was generated
+    from the same context (exact hash) and its question embedding has cosine similarity above the threshold.
+    """
+
+    def __init__(self, embed_fn, max_size=PROMPT_CACHE_SIZE, threshold=PROMPT_CACHE_THRESHOLD):
+        self._embed_fn = embed_fn
+        self._max_size = max_size
+        self._threshold = threshold
+        self._entries = OrderedDict()  # sha256(context hash, question) -> (context hash, question embedding, response)
+        self._keys = []
+        self._contexts = np.empty(0, dtype=object)
+        self._matrix = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _embed(self, question):
+        q = np.asarray(self._embed_fn(question), dtype=np.float32)
+        return q / (np.linalg.norm(q) or 1.0)
+
+    def get(self, question, context):
+        """Return (cached response or None, question embedding to pass to put on a miss)."""
+        context_hash = self._hash(context)
+        key = self._hash(context_hash + "\0" + question)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key][2], None
+        q = self._embed(question)
+        candidates = np.flatnonzero(self._contexts == context_hash)
+        if len(candidates):
+            scores = self._matrix[candidates] @ q
+            best = int(np.argmax(scores))
+            if scores[best] > self._threshold:
+                hit = self._keys[candidates[best]]
+                self._entries.move_to_end(hit)
+                return self._entries[hit][2], q
+        return None, q
+
+    def put(self, question, context, response, question_vec=None):
+        if question_vec is None:
+            question_vec = self._embed(question)
+        context_hash = self._hash(context)
+        self._entries[self._hash(context_hash + "\0" + question)] = (context_hash, question_vec, response)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+        self._keys = list(self._entries)
+        self._contexts = np.array([c for c, _, _ in self._entries.values()], dtype=object)
+        self._matrix = np.stack([vec for _, vec, _ in self._entries.values()])
+
 class LLMAgent(Agent):
-    def __init__(self, llm):
+    def __init__(self, llm, cache=None):
         super().__init__(
             role="LLM Processor",
             backstory="I analyze and refine retrieved excerpts to generate meaningful insights.",
             goal="Summarize and interpret retrieved text to provide a clear response."
         )
         self.llm = llm
+        self._cache = cache
     
-    def execute_task(self, task: Task, context: dict = None, tools: list = None):
+    @staticmethod
+    def _system_prompt(context):
         if not context or not isinstance(context, str) or len(context.strip()) == 0:
-            return "No relevant information found in the document."
-        
-        system_prompt = (
+            return None
+        return (
             "You are an AI assistant that answers ONLY based on the provided document excerpts. "
             "Do not use external knowledge. If the answer is not found, reply with 'Not found in the document.'\n\n"
             "DOCUMENT EXCERPTS:\n" + context
         )
 
-        return self.llm.call([{"role": "system", "content": system_prompt}, {"role": "user", "content": task.description}])
+    def _prepare(self, task, context, question):
+        """Build the chat messages and consult the cache.
+
+        Returns (messages, answer, cache_entry); `answer` is set when no LLM call is needed.
+        `question` is the user's query (the retrieval task's description); the cache matches on it,
+        not on this task's fixed instruction.
+        """
+        system_prompt = self._system_prompt(context)
+        if system_prompt is None:
+            return None, "No relevant information found in the document.", None
+
+        messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": task.description}]
+        if self._cache is None:
+            return messages, None, None
+        question = question or task.description
+        cached, question_vec = self._cache.get(question, context)
+        return messages, cached, (question, context, question_vec)
+
+    def _remember(self, cache_entry, response):
+        if self._cache is not None and cache_entry is not None and response:
+            question, context, question_vec = cache_entry
+            self._cache.put(question, context, response, question_vec)
+
+    def _completion_params(self):
+        # Kept to what this app configures on the LLM, plus any extra litellm params set on it
+        params = {"model": self.llm.model, "base_url": self.llm.base_url}
+        params.update(getattr(self.llm, "additional_params", None) or {})
+        return params
+
+    def execute_task(self, task: Task, context: dict = None, tools: list = None, question: str = None):
+        messages, answer, cache_entry = self._prepare(task, context, question)
+        if answer is not None:
+            return answer
+        response = self.llm.call(messages)
+        self._remember(cache_entry, response)
+        return response
+
+    def stream_task(self, task: Task, context: str = None, question: str = None):
+        # Same as execute_task, but yields tokens as the model decodes them
+        messages, answer, cache_entry = self._prepare(task, context, question)
+        if answer is not None:
+            yield answer
+            return
+
+        parts = []
+        for chunk in litellm.completion(messages=messages, stream=True, **self._completion_params()):
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        self._remember(cache_entry, "".join(parts))
 
 
-def extract_think_content(text):
-    match = re.search(r'<think>(.*?)</think>', text, flags=re.DOTALL)
-    return match.group(1).strip() if match else ""
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
 
-# Function to remove everything between <think> and </think> tags
-def remove_think_content(text):
-    return re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
+# Split a response into (answer without the <think> block, reasoning inside it) in one pass
+def split_think_content(text):
+    i = text.find(_THINK_OPEN)
+    if i == -1:
+        return text, ""
+    j = text.find(_THINK_CLOSE, i + len(_THINK_OPEN))
+    if j == -1:
+        return text, ""
+    think = text[i + len(_THINK_OPEN):j].strip()
+    clean = text[:i] + text[j + len(_THINK_CLOSE):]
+    return clean, think
+
+# Length of the longest suffix of `text` that could be the start of `tag`
+def _partial_tag_len(text, tag):
+    for n in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:n]):
+            return n
+    return 0
+
+# Pass a token stream through, diverting a leading <think> block to on_reasoning(text so far) as it decodes
+def stream_without_think(chunks, on_reasoning):
+    chunks = iter(chunks)
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        head = buffer.lstrip()
+        if not (len(head) < len(_THINK_OPEN) and _THINK_OPEN.startswith(head)):
+            break
+    else:
+        # Stream ended before it could be told apart from an opening tag
+        if buffer:
+            yield buffer
+        return
+    if not head.startswith(_THINK_OPEN):
+        yield buffer
+        yield from chunks
+        return
+
+    reasoning = buffer[buffer.find(_THINK_OPEN) + len(_THINK_OPEN):]
+    searched = 0
+    while True:
+        j = reasoning.find(_THINK_CLOSE, searched)
+        if j != -1:
+            on_reasoning(reasoning[:j].strip())
+            rest = reasoning[j + len(_THINK_CLOSE):].lstrip()
+            if rest:
+                yield rest
+            yield from chunks
+            return
+        # Hold back a possibly split closing tag so it never flashes in the reasoning view
+        visible = len(reasoning) - _partial_tag_len(reasoning, _THINK_CLOSE)
+        on_reasoning(reasoning[:visible].strip())
+        searched = visible
+        chunk = next(chunks, None)
+        if chunk is None:
+            # Unterminated <think>: everything decoded was reasoning
+            on_reasoning(reasoning.strip())
+            return
+        reasoning += chunk
 
 # Streamlit UI
 st.title("Agentic RAG: Document Query Assistant")
@@ -67,15 +481,16 @@ st.sidebar.header("Upload a PDF")
 uploaded_file = st.sidebar.file_uploader("Choose a PDF file", type=["pdf"])
 
 if uploaded_file:
-    with open("temp.pdf", "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    
-    vectorstore = process_pdf("temp.pdf")
+    embedding_model = get_embedding_model()
+    pdf_key = pdf_cache_key(uploaded_file.getbuffer(), embedding_model.model_name)
+    vectorstore = load_vectorstore(pdf_key, uploaded_file)
     retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
     st.sidebar.success("PDF uploaded and processed! ✅ Start asking questions below.")
     pdf_retrieval_agent = PDFRetrievalAgent(retriever)
-    llm = LLM(model="ollama/deepseek-r1:1.5b", base_url="http://localhost:11434")
-    llm_agent = LLMAgent(llm)
+    llm = get_llm()
+    if "prompt_cache" not in st.session_state:
+        st.session_state["prompt_cache"] = SemanticCache(embedding_model.embed_query)
+    llm_agent = LLMAgent(llm, cache=st.session_state["prompt_cache"])
 
     if "messages" not in st.session_state:
         st.session_state["messages"] = []
@@ -89,23 +504,33 @@ if uploaded_file:
         retrieval_task = Task(description=prompt, expected_output="Relevant excerpts from the PDF.", agent=pdf_retrieval_agent)
         llm_task = Task(description="Analyze and summarize the retrieved text.", expected_output="A well-structured response.", agent=llm_agent)
         
-        crew = Crew(agents=[pdf_retrieval_agent, llm_agent], tasks=[retrieval_task, llm_task], verbose=True, process=Process.sequential)
+        # The crew runs retrieval; the LLM step is streamed so the answer renders while it decodes
+        crew = Crew(agents=[pdf_retrieval_agent], tasks=[retrieval_task], verbose=True, process=Process.sequential)
         result = crew.kickoff()
-
-        answer = result.raw if result else "No relevant information found."
-
-        result_content=remove_think_content(answer)
-        show_think=extract_think_content(answer)
-        st.session_state["messages"].append({"role": "assistant", "content": result_content})
-
+        retrieved_text = result.raw if result else ""
 
         with st.chat_message("user"):
             st.write(prompt)
 
-        if show_think:
-            with st.expander("🤔 Show/Hide Reasoning"):
-                st.write(show_think)
-                
+        # Reserve the slot above the answer; reasoning streams into it while the model is still thinking
+        reasoning_slot = st.container()
+        reasoning = {"placeholder": None}
+
+        def show_reasoning(text):
+            if reasoning["placeholder"] is None:
+                with reasoning_slot:
+                    with st.expander("🤔 Show/Hide Reasoning", expanded=True):
+                        reasoning["placeholder"] = st.empty()
+            reasoning["placeholder"].markdown(text)
 
         with st.chat_message("assistant"):
-            st.write(result_content)
+            result_content = st.write_stream(stream_without_think(llm_agent.stream_task(llm_task, context=retrieved_text, question=prompt), show_reasoning))
+
+        # Drop any <think> block that did not lead the response
+        result_content, show_think = split_think_content(result_content or "")
+        st.session_state["messages"].append({"role": "assistant", "content": result_content})
+
+        if show_think and reasoning["placeholder"] is None:
+            with reasoning_slot:
+                with st.expander("🤔 Show/Hide Reasoning"):
+                    st.write(show_think)
@@ -1,32 +1,88 @@
 import streamlit as st
 import asyncio
-from PyPDF2 import PdfReader
+import concurrent.futures
+import atexit
+import threading
 from fastmcp import Client
-import json
+from fastmcp.exceptions import ToolError
+import orjson
+from pdf_extract import extract_text_from_pdf
 
 # MCP endpoint
 MCP_URL = "server.py"  # Replace with actual running MCP server address
-
-
-# Extract text from PDF
-def extract_text_from_pdf(uploaded_file):
-    reader = PdfReader(uploaded_file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text.strip()
-
-
-# Async wrapper to call MCP tool
-async def call_mcp_tool(tool_name, inputs):
-    async with Client(MCP_URL) as client:
-        response = await client.call_tool(tool_name, inputs)
-        return response
-
-
-# Wrapper for Streamlit to run async function
-def run_async_tool(tool_name, inputs):
-    return asyncio.run(call_mcp_tool(tool_name, inputs))
+MCP_CONNECT_TIMEOUT = 30  # seconds
+MCP_CALL_TIMEOUT = 600  # seconds; covers two local LLM generations
+
+
+# Extract once per distinct upload: Streamlit reruns the script on every widget interaction.
+# Keyed on file_id so the cache doesn't hash (or hold) a copy of the file's bytes.
+@st.cache_data
+def extract_pdf_text(file_id, _uploaded_file):
+    return extract_text_from_pdf(_uploaded_file)
+
+
+# One MCP client per process, kept connected on a background event loop.
+# asyncio.run would bind the client to a loop that is closed after each call.
+@st.cache_resource
+def get_mcp_session():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    client = Client(MCP_URL)
+    asyncio.run_coroutine_threadsafe(client.__aenter__(), loop).result(timeout=MCP_CONNECT_TIMEOUT)
+    atexit.register(close_mcp_session, loop, client)
+    return loop, client
+
+
+def close_mcp_session(loop, client):
+    if not loop.is_running():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(client.__aexit__(None, None, None), loop).result(timeout=5)
+    except Exception:
+        pass  # The transport is already broken; stopping the loop is all that is left to do
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+
+# Drop the cached session so the next call reconnects (e.g. after the server process exited)
+def reset_mcp_session():
+    loop, client = get_mcp_session()
+    get_mcp_session.clear()
+    close_mcp_session(loop, client)
+
+
+# Run a coroutine taking the shared client on its loop and wait for the result.
+# A broken session is replaced and the call retried once; tool errors are not retried.
+def run_with_client(coro_fn, *args):
+    for attempt in range(2):
+        loop, client = get_mcp_session()
+        future = asyncio.run_coroutine_threadsafe(coro_fn(client, *args), loop)
+        try:
+            return future.result(timeout=MCP_CALL_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            reset_mcp_session()
+            raise TimeoutError(f"MCP server did not respond within {MCP_CALL_TIMEOUT}s")
+        except ToolError:
+            raise
+        except Exception:
+            reset_mcp_session()
+            if attempt == 1:
+                raise
+
+
+# Run the whole pipeline as two fused tool calls: parse both documents, then match and summarize
+async def run_all(client, resume_text, jd_text):
+    parsed = await client.call_tool("parse_both", {"resume_text": resume_text, "jd_text": jd_text})
+    parsed_content = orjson.loads(parsed[0].text)
+    if "error" in parsed_content:
+        return {"parse_error": parsed_content["error"]}
+
+    analysis = await client.call_tool("match_and_summarize", {
+        "parsed_resume": parsed_content["parsed_resume"],
+        "parsed_jd": parsed_content["parsed_jd"]
+    })
+    return orjson.loads(analysis[0].text)
 
 
 # UI Setup
@@ -44,7 +100,7 @@ with col1:
     if resume_source == "Upload PDF":
         resume_file = st.file_uploader("Upload Resume (PDF)", type=["pdf"], key="resume_pdf")
         if resume_file:
-            resume_text = extract_text_from_pdf(resume_file)
+            resume_text = extract_pdf_text(resume_file.file_id, resume_file)
     else:
         resume_text = st.text_area("Paste Resume Text", height=300)
 
@@ -60,7 +116,7 @@ with col2:
     if jd_source == "Upload PDF":
         jd_file = st.file_uploader("Upload JD (PDF)", type=["pdf"], key="jd_pdf")
         if jd_file:
-            jd_text = extract_text_from_pdf(jd_file)
+            jd_text = extract_pdf_text(jd_file.file_id, jd_file)
     else:
         jd_text = st.text_area("Paste JD Text", height=300)
 
@@ -72,36 +128,20 @@ if st.button("Match Resume to JD"):
     if not resume_text.strip() or not jd_text.strip():
         st.error("Please provide both Resume and Job Description content.")
     else:
-        with st.spinner("🔍 Parsing Resume..."):
-            parsed_resume = run_async_tool("parse_resume", {"resume_text": resume_text})
-            parsed_resume_content = json.loads(parsed_resume[0].text)
-
-        with st.spinner("🔍 Parsing JD..."):
-            parsed_jd = run_async_tool("parse_jd", {"jd_text": jd_text})
-            parsed_jd_content = json.loads(parsed_jd[0].text)
-
-        with st.spinner("🤝 Matching Resume to JD..."):
-            match_result = run_async_tool("match_resume_to_jd", {
-                "parsed_resume": parsed_resume_content["parsed_resume"],
-                "parsed_jd": parsed_jd_content["parsed_jd"]
-            })
-
-        with st.spinner("📉 Summarizing Gaps..."):
-            gap_summary = run_async_tool("summarize_gap", {
-                "parsed_resume": parsed_resume_content["parsed_resume"],
-                "parsed_jd": parsed_jd_content["parsed_jd"]
-            })
+        with st.spinner("🔍 Parsing, matching and summarizing gaps..."):
+            analysis = run_with_client(run_all, resume_text, jd_text)
+
+        if "parse_error" in analysis:
+            st.error(f"Could not parse the Resume and JD ({analysis['parse_error']}). Please try again.")
+            st.stop()
 
         # ---- Display Results ----
         st.subheader("✅ Match Result")
-        try:
-            st.json(json.loads(match_result[0].text))
-        except Exception as e:
-            st.markdown(match_result[0].text)
+        match_result = analysis.get("match_resume")
+        if isinstance(match_result, dict):
+            st.json(match_result)
+        else:
+            st.markdown(match_result or "No match result returned.")
 
         st.subheader("📊 Gap Summary")
-        try:
-            gap_summary_json = json.loads(gap_summary[0].text)
-            st.markdown(gap_summary_json.get("gap_summary", "No summary returned."))
-        except Exception as e:
-            st.error(f"Error parsing gap summary: {e}")
+        st.markdown(analysis.get("gap_summary") or "No summary returned.")
@@ -1,5 +1,7 @@
 import logging
-from typing import Dict
+import threading
+from collections import OrderedDict
+from typing import Dict, Union
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 from langchain_ollama import OllamaLLM
@@ -23,13 +25,140 @@ except Exception as e:
     logging.error(f"Failed to initialize FastMCP: {e}")
     raise
 
-# Set up Ollama model
+# Set up Ollama model, pinned in memory so tool calls don't pay a reload after the default 5m TTL
+OLLAMA_SETTINGS = {"model": "llama3.2", "keep_alive": "1h", "num_ctx": 4096}
 try:
-    model = OllamaLLM(model="llama3.2")
+    model = OllamaLLM(**OLLAMA_SETTINGS)
 except Exception as e:
     logging.error(f"Failed to initialize OllamaLLM: {e}")
     raise
 
+# Warm-up: load the weights now instead of on the first user request. Same settings as `model`
+# (a different num_ctx would force a reload), but generate a single token.
+def warm_up_model():
+    try:
+        OllamaLLM(**OLLAMA_SETTINGS, num_predict=1).invoke("ping")
+    except Exception as e:
+        logging.warning(f"Ollama warm-up failed, model will load on first request: {e}")
+
+# Runs at import so `mcp dev` / `mcp run` (which import this module) warm up too; off-thread so startup isn't blocked
+threading.Thread(target=warm_up_model, daemon=True).start()
+
+# Normalise LangChain output (str, AIMessage or list of parts) to text
+def output_text(result) -> str:
+    if isinstance(result, list) and result:
+        result = result[0].get('text', '') if isinstance(result[0], dict) else str(result[0])
+    elif hasattr(result, 'content'):
+        result = result.content  # Handle AIMessage
+    return str(result).strip()
+
+# Identical prompt + inputs return the previous generation instead of re-running the model.
+# Exact match only: near-duplicate resumes/JDs must not share an analysis.
+PROMPT_CACHE_SIZE = 128
+_prompt_cache = OrderedDict()
+
+def _prompt_cache_key(template: str, inputs: Dict):
+    return template, tuple(sorted(inputs.items()))
+
+def invoke_cached(template: str, **inputs) -> str:
+    key = _prompt_cache_key(template, inputs)
+    if key in _prompt_cache:
+        _prompt_cache.move_to_end(key)
+        return _prompt_cache[key]
+    chain = ChatPromptTemplate.from_template(template) | model
+    result = output_text(chain.invoke(inputs))
+    _prompt_cache[key] = result
+    while len(_prompt_cache) > PROMPT_CACHE_SIZE:
+        _prompt_cache.popitem(last=False)
+    return result
+
+# Drop an output the caller could not use, so a retry samples a fresh generation
+def forget_cached(template: str, **inputs):
+    _prompt_cache.pop(_prompt_cache_key(template, inputs), None)
+
+# Parse a JSON object from model output, tolerating text around it
+def load_json_object(text: str) -> Dict:
+    start, end = text.find("{"), text.rfind("}")
+    return json.loads(text[start:end + 1] if start != -1 and end > start else text)
+
+# Fused tools pass parsed documents as native JSON; render them as text only when building a prompt
+def as_text(value) -> str:
+    return value if isinstance(value, str) else json.dumps(value, indent=2)
+
+# -------------------------- #
+# ------- PROMPTS ---------- #
+# -------------------------- #
+# All instructions come first and the documents last, so every prompt starts with a fixed
+# byte prefix that Ollama can serve from its KV cache; with the resume ahead of the JD,
+# the resume's prefill is also reused when one resume is matched against several JDs.
+
+COMPARISON_INPUTS = (
+    "Resume:\n"
+    "{parsed_resume}\n\n"
+    "Job Description:\n"
+    "{parsed_jd}\n"
+)
+
+PARSE_RESUME_PROMPT = (
+    "You are a resume parser. Extract the following fields from the text:\n"
+    "- Name\n"
+    "- Education\n"
+    "- Skills\n"
+    "- Work experience (roles, companies, duration)\n\n"
+    "Resume:\n"
+    "{resume_text}\n"
+)
+
+PARSE_JD_PROMPT = (
+    "You are a JD parser. Extract:\n"
+    "- Job title\n"
+    "- Responsibilities\n"
+    "- Required skills\n"
+    "- Preferred skills\n\n"
+    "Job Description:\n"
+    "{jd_text}\n"
+)
+
+MATCH_PROMPT = (
+    "Compare the following resume info to the job description info.\n"
+    "List skills or experiences that MATCH and those that are MISSING(present in Job Description but not in Resume ).\n"
+    'Respond as JSON: {{"matched_skills": [], "missing_skills": [], "match_score": 0.0}}\n\n'
+    + COMPARISON_INPUTS
+)
+
+GAP_SUMMARY_PROMPT = (
+    "Generate a professional gap analysis summary comparing the resume and JD.\n"
+    "Highlight strengths, gaps, and whether the candidate is a good fit.\n\n"
+    + COMPARISON_INPUTS
+)
+
+PARSE_BOTH_PROMPT = (
+    "You are a resume and JD parser.\n"
+    "From the resume, extract:\n"
+    "- Name\n"
+    "- Education\n"
+    "- Skills\n"
+    "- Work experience (roles, companies, duration)\n"
+    "From the job description, extract:\n"
+    "- Job title\n"
+    "- Responsibilities\n"
+    "- Required skills\n"
+    "- Preferred skills\n"
+    'Respond as JSON: {{"parsed_resume": {{}}, "parsed_jd": {{}}}}\n\n'
+    "Resume:\n"
+    "{resume_text}\n\n"
+    "Job Description:\n"
+    "{jd_text}\n"
+)
+
+MATCH_AND_SUMMARIZE_PROMPT = (
+    "Compare the following resume info to the job description info.\n"
+    "List skills or experiences that MATCH and those that are MISSING(present in Job Description but not in Resume ).\n"
+    "Then write a professional gap analysis summary highlighting strengths, gaps, and whether the candidate is a good fit.\n"
+    'Respond as JSON: {{"matched_skills": [], "missing_skills": [], "match_score": 0.0, "gap_summary": ""}}\n\n'
+    + COMPARISON_INPUTS
+)
+
 # -------------------------- #
 # ------- TOOLS ------------ #
 # -------------------------- #
@@ -39,119 +168,72 @@ def parse_resume(resume_text: str) -> Dict:
     """
     Extract structured info from resume
     """
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are a resume parser. Extract the following fields from the text:
-        - Name
-        - Education
-        - Skills
-        - Work experience (roles, companies, duration)
-
-        Resume:
-        {resume_text}
-        """
-    )
-    chain = prompt | model
-    result = chain.invoke({"resume_text": resume_text})
-    # Handle LangChain output (e.g., AIMessage or list)
-    if isinstance(result, list) and result:
-        result = result[0].get('text', '') if isinstance(result[0], dict) else str(result[0])
-    elif hasattr(result, 'content'):
-        result = result.content  # Handle AIMessage
-    return {"parsed_resume": str(result).strip()}
+    result = invoke_cached(PARSE_RESUME_PROMPT, resume_text=resume_text)
+    return {"parsed_resume": result}
 
 @mcp.tool()
 def parse_jd(jd_text: str) -> Dict:
     """
     Extract structured info from Job Description
     """
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are a JD parser. Extract:
-        - Job title
-        - Responsibilities
-        - Required skills
-        - Preferred skills
-
-        Job Description:
-        {jd_text}
-        """
-    )
-    chain = prompt | model
-    result = chain.invoke({"jd_text": jd_text})
-    # Handle LangChain output
-    if isinstance(result, list) and result:
-        result = result[0].get('text', '') if isinstance(result[0], dict) else str(result[0])
-    elif hasattr(result, 'content'):
-        result = result.content
-    return {"parsed_jd": str(result).strip()}
+    result = invoke_cached(PARSE_JD_PROMPT, jd_text=jd_text)
+    return {"parsed_jd": result}
 
 @mcp.tool()
 def match_resume_to_jd(parsed_resume: str, parsed_jd: str) -> Dict:
     """
     Compare parsed resume and JD — list matches and mismatches
     """
-    prompt = ChatPromptTemplate.from_template(
-        """
-        Compare the following resume info to the job description info.
-
-        Resume:
-        {parsed_resume}
-
-        Job Description:
-        {parsed_jd}
-
-        List skills or experiences that MATCH and those that are MISSING(present in Job Description but not in Resume ).
-        Respond as JSON: {{"matched_skills": [], "missing_skills": [], "match_score": 0.0}}
-        """
-    )
-    chain = prompt | model
-    raw_output = chain.invoke({
-        "parsed_resume": parsed_resume,
-        "parsed_jd": parsed_jd
-    })
-    # Handle LangChain output
-    if isinstance(raw_output, list) and raw_output:
-        raw_output = raw_output[0].get('text', '') if isinstance(raw_output[0], dict) else str(raw_output[0])
-    elif hasattr(raw_output, 'content'):
-        raw_output = raw_output.content
+    raw_output = invoke_cached(MATCH_PROMPT, parsed_resume=parsed_resume, parsed_jd=parsed_jd)
     logging.info(f"[match_resume_to_jd] Raw model output:\n{raw_output}")
     try:
-        parsed_output = json.loads(raw_output.strip())
+        parsed_output = json.loads(raw_output)
         return {"match_resume": parsed_output}
     except json.JSONDecodeError as e:
         logging.error(f"Failed to parse JSON output: {e}")
-        return {"match_resume": raw_output.strip(), "error": "Invalid JSON"}
+        forget_cached(MATCH_PROMPT, parsed_resume=parsed_resume, parsed_jd=parsed_jd)
+        return {"match_resume": raw_output, "error": "Invalid JSON"}
 
 @mcp.tool()
 def summarize_gap(parsed_resume: str, parsed_jd: str) -> Dict:
     """
     Generate a business-style gap analysis summary
     """
-    prompt = ChatPromptTemplate.from_template(
-        """
-        Generate a professional gap analysis summary comparing the resume and JD.
-
-        Resume:
-        {parsed_resume}
-
-        JD:
-        {parsed_jd}
-
-        Highlight strengths, gaps, and whether the candidate is a good fit.
-        """
-    )
-    chain = prompt | model
-    result = chain.invoke({
-        "parsed_resume": parsed_resume,
-        "parsed_jd": parsed_jd
-    })
-    # Handle LangChain output
-    if isinstance(result, list) and result:
-        result = result[0].get('text', '') if isinstance(result[0], dict) else str(result[0])
-    elif hasattr(result, 'content'):
-        result = result.content
-    return {"gap_summary": str(result).strip()}
+    result = invoke_cached(GAP_SUMMARY_PROMPT, parsed_resume=parsed_resume, parsed_jd=parsed_jd)
+    return {"gap_summary": result}
+
+@mcp.tool()
+def parse_both(resume_text: str, jd_text: str) -> Dict:
+    """
+    Extract structured info from resume and Job Description in one generation
+    """
+    raw_output = invoke_cached(PARSE_BOTH_PROMPT, resume_text=resume_text, jd_text=jd_text)
+    logging.info(f"[parse_both] Raw model output:\n{raw_output}")
+    try:
+        parsed_output = load_json_object(raw_output)
+        return {"parsed_resume": parsed_output["parsed_resume"], "parsed_jd": parsed_output["parsed_jd"]}
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        logging.error(f"Failed to parse JSON output: {e}")
+        forget_cached(PARSE_BOTH_PROMPT, resume_text=resume_text, jd_text=jd_text)
+        # No per-document split to compare, so report the failure instead of matching the raw text to itself
+        return {"error": "Invalid JSON", "raw_output": raw_output}
+
+@mcp.tool()
+def match_and_summarize(parsed_resume: Union[str, Dict], parsed_jd: Union[str, Dict]) -> Dict:
+    """
+    Compare parsed resume and JD and write the gap analysis in one generation
+    """
+    prompt_inputs = {"parsed_resume": as_text(parsed_resume), "parsed_jd": as_text(parsed_jd)}
+    raw_output = invoke_cached(MATCH_AND_SUMMARIZE_PROMPT, **prompt_inputs)
+    logging.info(f"[match_and_summarize] Raw model output:\n{raw_output}")
+    try:
+        parsed_output = load_json_object(raw_output)
+        gap_summary = parsed_output.pop("gap_summary", "")
+        return {"match_resume": parsed_output, "gap_summary": as_text(gap_summary)}
+    except (json.JSONDecodeError, AttributeError, TypeError) as e:
+        logging.error(f"Failed to parse JSON output: {e}")
+        forget_cached(MATCH_AND_SUMMARIZE_PROMPT, **prompt_inputs)
+        return {"match_resume": raw_output, "gap_summary": raw_output, "error": "Invalid JSON"}
 
 # -------------------------- #
 # ------- ENTRY ------------ #